@@ -1,3 +1,4 @@
+import datetime
 import decimal
 from decimal import Decimal
 import functools
@@ -5,6 +6,8 @@ import re
 
 import dateutil.parser
 
+from .rules import AccountTrie
+
 START_DATE = '2010-01-01'
 
 
@@ -37,21 +40,52 @@ class InvalidCommodityError(Exception):
         self.unit = unit
 
 
-def starts_transaction(line):
-    # Check if a line looks like a plausible beginning to a transaction
-    if not line:  # blank lines never start transactions
-        return False
-    date = line
-    if ' ' in line:
-        (date, rest) = line.split(' ', 1)
-        # Strip aux date
-        date = date.split('=', 1)[0]
-    try:
-        date = dateutil.parser.parse(date)
-    except ValueError:
-        return False
-
-    return True
+# Kinds of line, as returned by classify_line.
+BLANK = 'blank'
+COMMENT = 'comment'
+POSTING = 'posting'
+TRANSACTION = 'transaction'
+ALIAS = 'alias'
+APPLY = 'apply'
+END_APPLY = 'end apply'
+DIRECTIVE = 'directive'
+PASSTHROUGH = 'passthrough'
+
+# A ledger date (2017-01-02, 2017/1/2, 2/6/2010, or just 1/2), an
+# optional auxiliary date, and then either whitespace or end of line.
+TRANSACTION_RE = re.compile(
+    r'\d{1,4}[-/.]\d{1,2}(?:[-/.]\d{1,4})?(?:=[-/.\d]+)?(?:\s|$)')
+
+# Most lines can be classified by their first character alone.
+LINE_KINDS_BY_FIRST_CHAR = dict.fromkeys(' \t', POSTING)
+LINE_KINDS_BY_FIRST_CHAR.update(dict.fromkeys(';#%|*', COMMENT))
+LINE_KINDS_BY_FIRST_CHAR.update(dict.fromkeys('0123456789', TRANSACTION))
+LINE_KINDS_BY_FIRST_CHAR['a'] = ALIAS
+LINE_KINDS_BY_FIRST_CHAR['e'] = END_APPLY
+
+
+def classify_line(line):
+    """Decide what kind of line this is, looking at as little as possible.
+
+    Indented lines are always POSTING, even if they turn out to be
+    blank or a comment; it's up to the caller to decide whether
+    there's a transaction for them to continue.
+    """
+    if not line:
+        return BLANK
+
+    kind = LINE_KINDS_BY_FIRST_CHAR.get(line[0])
+    if kind is None:
+        return DIRECTIVE if line[0].isalpha() else PASSTHROUGH
+    if kind is TRANSACTION:
+        return TRANSACTION if TRANSACTION_RE.match(line) else PASSTHROUGH
+    if kind is ALIAS:
+        if line.startswith('alias '):
+            return ALIAS
+        return APPLY if line.startswith('apply ') else DIRECTIVE
+    if kind is END_APPLY:
+        return END_APPLY if line.startswith('end apply') else DIRECTIVE
+    return kind
 
 
 def trim_comment(line):
@@ -132,28 +166,113 @@ def translate_amount(amount):
     return ' '.join([amount, units])
 
 
-def translate_file(file_lines):
-    accounts = set()
-    aliases = {}
+class PostingListener(object):
+    """Something that wants to know about postings as they're translated.
+
+    Translator calls posting() for every posting, where `amount`,
+    `cost` and `price` are translated amounts like "40 USD", or None
+    when they were left out. It calls end_entry() at the end of each
+    entry, with the line number the entry started on.
+    """
+    def posting(self, date, lineno, account, amount, cost, price):
+        pass
+
+    def end_entry(self, lineno):
+        pass
+
+
+class Translator(object):
+    """Translate a ledger file one line at a time.
 
-    output = []
-    current_entry = []
-    in_balance_assertion = False
+    This is what translate_file uses under the hood. Feed it lines
+    with translate_line() and call finish() at EOF to get the
+    translated file.
+
+    Account names are rewritten by `rules`, a list of (prefix,
+    replacement) pairs, as well as by any `alias` and `apply account`
+    directives in the file.
+
+    `listeners` are told about every posting as it's translated, and
+    about every entry as it ends; see PostingListener.
+
+    Everything the translator knows is plain data, which can be saved
+    with get_state() and picked up again later with from_state().
+    """
+    def __init__(self, rules=(), listeners=()):
+        self.accounts = set()
+        self.rules = [tuple(rule) for rule in rules]
+        self.aliases = {}
+        # One entry per `apply` directive we're inside of: the account
+        # prefix for `apply account`, and None for anything else.
+        self.applied = []
+        self.rewrites = AccountTrie(self.rules)
+        # Cache of account names as written to their translations.
+        # Cleared whenever aliases or applied accounts change.
+        self.resolved = {}
+
+        self.listeners = list(listeners)
+
+        self.output = []
+        self.current_entry = []
+        self.in_balance_assertion = False
+        # Date and line number of the current entry's first line.
+        self.entry_date = None
+        self.entry_lineno = None
+        # Number of lines translated so far, i.e. the index of the next line.
+        self.lineno = 0
+        self.transactions = 0
+
+    def get_state(self):
+        """Return the translator's state as JSON-serializable data."""
+        return {
+            'accounts': sorted(self.accounts),
+            'rules': self.rules,
+            'aliases': self.aliases,
+            'applied': self.applied,
+            'output': self.output,
+            'current_entry': self.current_entry,
+            'in_balance_assertion': self.in_balance_assertion,
+            'entry_date': self.entry_date and self.entry_date.isoformat(),
+            'entry_lineno': self.entry_lineno,
+            'lineno': self.lineno,
+            'transactions': self.transactions,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        translator = cls(rules=state['rules'])
+        translator.accounts = set(state['accounts'])
+        for (src, dest) in state['aliases'].items():
+            translator.add_alias(src, dest)
+        translator.applied = list(state['applied'])
+        translator.output = list(state['output'])
+        translator.current_entry = list(state['current_entry'])
+        translator.in_balance_assertion = state['in_balance_assertion']
+        if state['entry_date']:
+            translator.entry_date = datetime.datetime.strptime(
+                state['entry_date'], '%Y-%m-%d').date()
+        translator.entry_lineno = state['entry_lineno']
+        translator.lineno = state['lineno']
+        translator.transactions = state['transactions']
+        return translator
+
+    def translate_line(self, line):
+        lineno = self.lineno
+        self.lineno += 1
 
-    for lineno, line in enumerate(file_lines):
         if line and line[-1] == '\n':
             line = line[:-1]
 
-        significant = line.strip()
-        (significant, comment) = trim_comment(line)
-        significant = significant.strip()
+        kind = classify_line(line)
 
-        if current_entry and line.startswith(' '):
+        if kind is POSTING and self.current_entry:
             # Continuation of current entry.
+            (significant, comment) = trim_comment(line)
+            significant = significant.strip()
             line = '  ' + line.lstrip()
             if not significant:
-                current_entry.append(line)
-                continue
+                self.current_entry.append(line)
+                return
 
             account = significant
             rest = None
@@ -163,16 +282,16 @@ def translate_file(file_lines):
             if account_end is not None:
                 account = significant[:account_end]
                 rest = significant[account_end:].strip()
-            account = aliases.get(account, translate_account(account))
-            accounts.add(account)
+            account = self.resolve_account(account)
+            self.accounts.add(account)
 
             # Check for balance assertion.
             # FIXME: We don't support balance assertions in the general case,
             # only as single-posting transactions, with zero as the addition.
             if rest and '=' in rest:
-                in_balance_assertion = True
+                self.in_balance_assertion = True
 
-                non_commented_lines = [l for l in current_entry
+                non_commented_lines = [l for l in self.current_entry
                                        if not l.lstrip().startswith(';')]
                 if len(non_commented_lines) != 1:
                     raise BalanceAssertionTooComplicated(lineno)
@@ -184,63 +303,75 @@ def translate_file(file_lines):
                     # from/gone to another account.
                     raise BalanceAssertionTooComplicated(lineno)
 
-                (date, _) = current_entry[0].split(' ', 1)
+                (date, _) = self.current_entry[0].split(' ', 1)
 
                 balance_assertion = '{} balance {}   {}'.format(
                     date, account, translate_amount(balance.strip()))
 
-                current_entry = [
+                self.current_entry = [
                     reattach_comment(balance_assertion, comment)
-                ] + current_entry[1:]
+                ] + self.current_entry[1:]
 
-                continue
+                return
 
             elif rest and '@' in rest:
                 # Could be a purchase or sale.
                 (amount, price) = rest.split('@')
                 # Translate commodity purchase/sales
                 if identify_commodity(amount):
-                    translated_amount = translate_amount(amount)
-                    number, units = translated_amount.strip().split(' ')
+                    translated_amount = translate_amount(amount).strip()
+                    translated_price = translate_amount(price).strip()
+                    number, units = translated_amount.split(' ')
                     if Decimal(number) > 0:
                         # A purchase!
                         format = '  {}        {} {{{}}}'
+                        self.add_posting(lineno, account, translated_amount,
+                                         cost=translated_price)
                     else:
                         # Correct spacing on sales at least
                         format = '  {}        {} @ {}'
-                    posting = format.format(account, translated_amount.strip(),
-                                            translate_amount(price).strip())
-                    current_entry.append(reattach_comment(posting, comment))
-                    continue
+                        self.add_posting(lineno, account, translated_amount,
+                                         price=translated_price)
+                    posting = format.format(account, translated_amount,
+                                            translated_price)
+                    self.current_entry.append(reattach_comment(posting, comment))
+                    return
                 # Don't do anything special with non-commodities
                 # (currencies like $ or €)
 
             # Another posting.
-            if in_balance_assertion:
+            if self.in_balance_assertion:
                 raise BalanceAssertionTooComplicated(lineno)
 
+            amount = None
             if rest:
-                posting = '  {}        {}'.format(account, translate_amount(rest))
+                amount = translate_amount(rest)
+                posting = '  {}        {}'.format(account, amount)
             else:
                 posting = '  {}'.format(account)
+            self.add_posting(lineno, account, amount)
 
-            current_entry.append(reattach_comment(posting, comment))
+            self.current_entry.append(reattach_comment(posting, comment))
 
-            # Since this continued an existing entry, skip to the next line.
-            continue
+            # Since this continued an existing entry, we're done.
+            return
 
-        if current_entry:
-            output.extend(current_entry)
-            current_entry = []
-            in_balance_assertion = False
+        self.end_entry()
 
-        if starts_transaction(significant):
+        if kind is TRANSACTION:
+            (significant, comment) = trim_comment(line)
+            significant = significant.strip()
             date = significant
             narration = ''
             if ' ' in significant:
                 date, narration = significant.split(' ', 1)
             date = date.split('=', 1)[0]
-            date = dateutil.parser.parse(date)
+            try:
+                date = dateutil.parser.parse(date)
+            except ValueError:
+                # Looked like a date, but wasn't one.
+                self.output.append(line)
+                return
 
             flag = '*'
             if narration[0] in ['!', '*']:
@@ -251,26 +382,100 @@ def translate_file(file_lines):
                 date=date.date(), flag=flag,
                 narration=narration.replace('"', '\\"'))
 
-            current_entry.append(reattach_comment(new_transaction, comment))
+            self.current_entry.append(reattach_comment(new_transaction, comment))
+            self.transactions += 1
+            self.entry_date = date.date()
+            self.entry_lineno = lineno
 
-        elif significant.startswith('alias'):
+        elif kind is ALIAS:
+            (significant, _) = trim_comment(line)
             (alias_cmd, rest) = significant.split(' ', 1)
             (src, dest) = rest.split('=', 1)
-            aliases[src.strip()] = translate_account(dest.strip())
-
-        else:
-            output.append(line)
+            self.add_alias(src.strip(), dest.strip())
+
+        elif kind is APPLY:
+            (significant, _) = trim_comment(line)
+            words = significant.split(None, 2)
+            if len(words) == 3 and words[1] == 'account':
+                self.applied.append(words[2].strip())
+                self.resolved = {}
+            else:
+                # Nothing to do with accounts; leave it be.
+                self.applied.append(None)
+                self.output.append(line)
 
-    # EOF ends a transaction, whether there was a newline or not.
-    if current_entry:
-        output.extend(current_entry)
+        elif kind is END_APPLY:
+            if self.applied and self.applied.pop() is not None:
+                self.resolved = {}
+            else:
+                self.output.append(line)
 
-    # Prepend any accounts we've ever encountered
-    account_openings = [
-        '{} open {}'.format(START_DATE, a)
-        for a in sorted(accounts)
-    ]
+        else:
+            self.output.append(line)
 
-    output = ['* Accounts'] + account_openings + ['* Transactions'] + output
+    def add_alias(self, src, dest):
+        self.aliases[src] = dest
+        self.rewrites.add(src, dest)
+        self.resolved = {}
 
-    return output
+    def resolve_account(self, account):
+        """Turn an account name from a posting into a beancount account."""
+        try:
+            return self.resolved[account]
+        except KeyError:
+            pass
+
+        # As in ledger, aliases apply to the account as written, and
+        # only an account they don't match gets the `apply account`
+        # prefixes.
+        full_account = self.rewrites.match(account)
+        if full_account is None:
+            full_account = ':'.join(
+                [prefix for prefix in self.applied if prefix is not None] +
+                [account])
+        translated = translate_account(full_account)
+        self.resolved[account] = translated
+        return translated
+
+    def add_posting(self, lineno, account, amount, cost=None, price=None):
+        for listener in self.listeners:
+            listener.posting(self.entry_date, lineno, account, amount,
+                             cost, price)
+
+    def end_entry(self):
+        """Finish off the current entry, if any."""
+        if self.current_entry:
+            for listener in self.listeners:
+                listener.end_entry(self.entry_lineno)
+            self.output.extend(self.current_entry)
+            self.current_entry = []
+            self.in_balance_assertion = False
+
+    def header(self):
+        """Return the lines that go before all the translated output."""
+        # Prepend any accounts we've ever encountered
+        account_openings = [
+            '{} open {}'.format(START_DATE, a)
+            for a in sorted(self.accounts)
+        ]
+        return ['* Accounts'] + account_openings + ['* Transactions']
+
+    def finish(self):
+        # EOF ends a transaction, whether there was a newline or not.
+        self.end_entry()
+        return self.header() + self.output
+
+
+def decode_line(raw):
+    """Decode a line read from a file opened in binary mode."""
+    line = raw.decode('utf-8')
+    if line.endswith('\r\n'):
+        line = line[:-2] + '\n'
+    return line
+
+
+def translate_file(file_lines, rules=(), listeners=()):
+    translator = Translator(rules=rules, listeners=listeners)
+    for line in file_lines:
+        translator.translate_line(line)
+    return translator.finish()
@@ -1,17 +1,182 @@
+import argparse
+import os
 import sys
-from . import translate_file, BalanceAssertionTooComplicated
+from . import Translator, BalanceAssertionTooComplicated, decode_line
+from . import balance
+from . import checkpoint
+from . import columns
+from . import progress
+from . import rules
+from . import shard
+from . import sourcemap
 
-def main():
-    filename = sys.argv[1]
+
+def positive_int(value):
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(
+            'must be a positive number, not {}'.format(value))
+    return number
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='ledger-to-beancount',
+        description='Convert a ledger file to beancount syntax. '
+        'Run "ledger-to-beancount serve" to start a conversion server.')
+    parser.add_argument('filename')
+    parser.add_argument(
+        '--checkpoint', metavar='FILE',
+        help='periodically save progress to FILE (and FILE.out), '
+        'so that an interrupted conversion can be resumed')
+    parser.add_argument(
+        '--checkpoint-every', metavar='LINES', type=positive_int,
+        default=checkpoint.DEFAULT_EVERY,
+        help='input lines between checkpoints (default: %(default)s)')
+    parser.add_argument(
+        '--resume', action='store_true',
+        help='continue from the last checkpoint')
+    parser.add_argument(
+        '--shard-by', choices=sorted(shard.SHARD_KEYS),
+        help='split the output into one file per year or per top-level '
+        'account, plus a root file that includes them all')
+    parser.add_argument(
+        '--output-dir', metavar='DIR',
+        help='directory to write shards to (required with --shard-by)')
+    parser.add_argument(
+        '--source-map', metavar='FILE',
+        help='also write a map from output lines back to ledger lines '
+        'to FILE, for use with ledger-to-beancount-sourcemap')
+    parser.add_argument(
+        '--rules', metavar='FILE',
+        help='rewrite account names using the "prefix = replacement" '
+        'rules in FILE')
+    parser.add_argument(
+        '--check-balance', action='store_true',
+        help='report transactions that don\'t balance on stderr, and '
+        'exit with status 1 if there were any')
+    parser.add_argument(
+        '--export-postings', metavar='FILE',
+        help='also write every posting to FILE as columns, in NumPy '
+        'format if FILE ends in .npz and CSV otherwise')
+    parser.add_argument(
+        '--progress', action='store_const', const='text',
+        help='report progress on stderr')
+    parser.add_argument(
+        '--progress-json', dest='progress', action='store_const',
+        const='json',
+        help='report progress on stderr, as one JSON object per line')
+    args = parser.parse_args(argv)
+    if args.resume and not args.checkpoint:
+        parser.error('--resume requires --checkpoint')
+    if args.shard_by and not args.output_dir:
+        parser.error('--shard-by requires --output-dir')
+    if args.shard_by and args.checkpoint:
+        parser.error('--shard-by cannot be combined with --checkpoint')
+    if args.export_postings and args.checkpoint:
+        parser.error('--export-postings cannot be combined with --checkpoint')
+    if args.check_balance and args.checkpoint:
+        parser.error('--check-balance cannot be combined with --checkpoint')
+    if args.source_map and (args.checkpoint or args.shard_by):
+        parser.error('--source-map cannot be combined with --checkpoint '
+                     'or --shard-by')
+    return args
+
+
+def translate_input(f, translator, reporter=None):
+    """Feed the lines of binary file `f` to `translator`."""
+    offset = 0
+    for raw in f:
+        offset += len(raw)
+        translator.translate_line(decode_line(raw))
+        if reporter and not translator.lineno % progress.CHECK_EVERY:
+            reporter.update(offset, translator)
+    if reporter:
+        reporter.finish(offset, translator)
+
+
+def report_imbalance(imbalance):
+    print(imbalance, file=sys.stderr)
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ['serve']:
+        from . import server
+        return server.main(argv[1:])
+
+    args = parse_args(argv)
+    reporter = None
+    if args.progress:
+        reporter = progress.Progress(os.path.getsize(args.filename),
+                                     json_lines=args.progress == 'json')
     try:
-        output = translate_file(open(filename).readlines())
-        print('\n'.join(output))
+        account_rules = []
+        if args.rules:
+            account_rules = rules.load_rules(args.rules)
+
+        if args.checkpoint:
+            checkpoint.translate_with_checkpoints(
+                args.filename, args.checkpoint, sys.stdout.buffer,
+                every=args.checkpoint_every, resume=args.resume,
+                progress=reporter, rules=account_rules)
+            return 0
+
+        listeners = []
+        checker = posting_columns = None
+        if args.check_balance:
+            checker = balance.BalanceChecker(report=report_imbalance)
+            listeners.append(checker)
+        if args.export_postings:
+            try:
+                writer = columns.open_writer(args.export_postings)
+            except ImportError:
+                print("Writing .npz files needs NumPy; try a .csv file.",
+                      file=sys.stderr)
+                return 1
+            posting_columns = columns.PostingColumns(writer)
+            listeners.append(posting_columns)
+
+        options = {'rules': account_rules, 'listeners': listeners}
+        if args.shard_by:
+            translator = shard.ShardingTranslator(
+                shard.SHARD_KEYS[args.shard_by], **options)
+        elif args.source_map:
+            translator = sourcemap.SourceMapTranslator(**options)
+        else:
+            translator = Translator(**options)
+        with open(args.filename, 'rb') as f:
+            translate_input(f, translator, reporter)
+
+        if args.shard_by:
+            shard.write_shards(translator, args.output_dir)
+        else:
+            output = translator.finish()
+            if args.source_map:
+                with open(args.source_map, 'wb') as f:
+                    translator.write_source_map(f)
+            print('\n'.join(output))
+        if posting_columns:
+            posting_columns.close()
+        if checker and checker.imbalances:
+            return 1
         return 0
     except BalanceAssertionTooComplicated as e:
         print("Balance assertion with leftovers on line {}.".format(e.lineno))
         print("Because this is a syntactic translation, we can't represent this in beancount.")
         print("Please separate this into two transactions and try again.")
         return 1
+    except rules.InvalidRuleError as e:
+        print("Can't understand line {} of {}; expected "
+              "\"prefix = replacement\".".format(e.lineno, e.path),
+              file=sys.stderr)
+        return 1
+    except checkpoint.CheckpointMismatch as e:
+        print("Checkpoint {} can't be used with the current version of {}.".format(
+            e.checkpoint_path, e.input_path), file=sys.stderr)
+        print("Run again without --resume to start over.", file=sys.stderr)
+        return 1
 
 
 if __name__ == '__main__':
@@ -0,0 +1,116 @@
+"""Check that transactions balance, as they're translated.
+
+BalanceChecker is a PostingListener. It collects the weight of each
+posting in a transaction by commodity: the amount itself, or for
+postings with a cost or a price, the amount times the cost or price,
+in the cost or price's commodity. When the transaction ends, each
+commodity's weights are added up in one go.
+
+If the transaction has exactly one posting without an amount, that
+posting takes whatever is left over, as it would in ledger or
+beancount. Otherwise, anything left over is reported, with the line
+number of the transaction.
+
+As in beancount, small differences are tolerated. A number written
+with two decimal places is allowed to be off by half a cent, so to
+speak; a commodity only ever written as whole numbers has to balance
+exactly.
+"""
+from collections import namedtuple, defaultdict
+from decimal import Decimal
+
+from . import PostingListener
+
+ZERO = Decimal(0)
+
+
+class Imbalance(namedtuple('Imbalance', 'lineno residuals elided')):
+    """A transaction that doesn't balance.
+
+    `lineno` is the 1-based line the transaction starts on,
+    `residuals` maps each commodity that's off to how much it's off
+    by, and `elided` is the number of postings without an amount.
+    """
+    def __str__(self):
+        if self.elided > 1:
+            problem = '{} postings without amounts'.format(self.elided)
+        else:
+            problem = "doesn't balance by {}".format(', '.join(
+                '{} {}'.format(number, commodity)
+                for (commodity, number) in sorted(self.residuals.items())))
+        return 'Transaction on line {}: {}'.format(self.lineno, problem)
+
+
+def split_amount(amount):
+    (number, commodity) = amount.split(' ', 1)
+    return (Decimal(number), commodity)
+
+
+def tolerance(number):
+    exponent = number.as_tuple().exponent
+    if exponent >= 0:
+        return ZERO
+    return Decimal((0, (5,), exponent - 1))
+
+
+class BalanceChecker(PostingListener):
+    """Check each transaction, collecting problems in `imbalances`.
+
+    If `report` is given, it's also called with each Imbalance as soon
+    as it's found. After each transaction, `inferred` holds the
+    amount, by commodity, of its posting without an amount, if it had
+    one.
+    """
+    def __init__(self, report=None):
+        self.imbalances = []
+        self.report = report
+        self.inferred = {}
+        self.start_entry()
+
+    def start_entry(self):
+        # Weights of the postings so far, by commodity, along with the
+        # numbers as written in that commodity (for the tolerance).
+        self.weights = defaultdict(list)
+        self.written = defaultdict(list)
+        self.elided = 0
+
+    def posting(self, date, lineno, account, amount, cost, price):
+        if amount is None:
+            self.elided += 1
+            return
+
+        (number, commodity) = split_amount(amount)
+        rate = cost or price
+        if rate is not None:
+            (rate, commodity) = split_amount(rate)
+            self.weights[commodity].append(number * rate)
+            self.written[commodity].append(rate)
+        else:
+            self.weights[commodity].append(number)
+            self.written[commodity].append(number)
+
+    def end_entry(self, lineno):
+        residuals = {}
+        for (commodity, numbers) in self.weights.items():
+            residual = sum(numbers, ZERO)
+            if residual:
+                residuals[commodity] = residual
+
+        self.inferred = {}
+        if self.elided == 1:
+            # What the posting without an amount must have been.
+            self.inferred = {commodity: -residual
+                             for (commodity, residual) in residuals.items()}
+        else:
+            unbalanced = {
+                commodity: residual
+                for (commodity, residual) in residuals.items()
+                if abs(residual) > max(map(tolerance,
+                                           self.written[commodity]))
+            }
+            if unbalanced or self.elided > 1:
+                imbalance = Imbalance(lineno + 1, unbalanced, self.elided)
+                self.imbalances.append(imbalance)
+                if self.report:
+                    self.report(imbalance)
+        self.start_entry()
@@ -0,0 +1,165 @@
+"""Periodically save a conversion's progress so it can be resumed.
+
+A checkpoint is two files. The checkpoint file itself is JSON,
+recording how far into the input we got and the translator's state
+at that point. Alongside it, `<checkpoint>.out` holds all the output
+that has been produced so far; output is moved out of the translator
+and appended to it at every checkpoint, so the JSON stays small.
+
+The checkpoint file is only ever replaced atomically, after the
+output it refers to has been written, so a run that is killed at any
+point leaves a consistent checkpoint behind.
+"""
+import json
+import os
+import shutil
+
+from . import Translator, decode_line
+from .progress import CHECK_EVERY
+
+# How many input lines to translate between checkpoints.
+DEFAULT_EVERY = 100000
+
+FORMAT_VERSION = 2
+
+
+class CheckpointMismatch(Exception):
+    """Exception signaling that a checkpoint can't be used for this input.
+
+    Either the checkpoint was written for a different file, the file
+    has changed since, or the output saved with the checkpoint is
+    missing or cut short.
+    """
+    def __init__(self, checkpoint_path, input_path):
+        self.checkpoint_path = checkpoint_path
+        self.input_path = input_path
+
+
+def output_path(checkpoint_path):
+    return checkpoint_path + '.out'
+
+
+def describe_input(input_path):
+    stat = os.stat(input_path)
+    return {
+        'path': os.path.abspath(input_path),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+    }
+
+
+def save_checkpoint(checkpoint_path, input_path, offset, translator, out):
+    """Record that we've translated everything before `offset`.
+
+    Any output the translator is holding is flushed to `out` first.
+    """
+    for line in translator.output:
+        out.write(line.encode('utf-8') + b'\n')
+    translator.output = []
+    out.flush()
+    os.fsync(out.fileno())
+
+    checkpoint = {
+        'version': FORMAT_VERSION,
+        'input': describe_input(input_path),
+        'offset': offset,
+        'output_size': out.tell(),
+        'state': translator.get_state(),
+    }
+    tmp_path = checkpoint_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, checkpoint_path)
+
+
+def load_checkpoint(checkpoint_path, input_path):
+    """Read the checkpoint at `checkpoint_path`, or None if there isn't one.
+
+    A run that is interrupted before its first checkpoint leaves none
+    behind, and resuming it just means starting from scratch.
+    """
+    try:
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return None
+    if (checkpoint.get('version') != FORMAT_VERSION or
+            checkpoint['input'] != describe_input(input_path)):
+        raise CheckpointMismatch(checkpoint_path, input_path)
+    try:
+        output_size = os.path.getsize(output_path(checkpoint_path))
+    except FileNotFoundError:
+        output_size = -1
+    if output_size < checkpoint['output_size']:
+        raise CheckpointMismatch(checkpoint_path, input_path)
+    return checkpoint
+
+
+def remove_checkpoint(checkpoint_path):
+    for path in [checkpoint_path, output_path(checkpoint_path)]:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def translate_with_checkpoints(input_path, checkpoint_path, stdout,
+                               every=DEFAULT_EVERY, resume=False,
+                               progress=None, rules=()):
+    """Translate `input_path`, checkpointing every `every` lines.
+
+    The translated file is written to the binary stream `stdout`, and
+    is identical to what translate_file would have produced. With
+    `resume`, pick up from the last checkpoint, if there is one,
+    instead of starting from scratch. Once the translation is
+    complete, the checkpoint is removed. If `progress` is given, it's
+    kept up to date as we go.
+
+    `rules` are passed on to the Translator. When resuming, the rules
+    saved in the checkpoint are used instead, so that the output comes
+    out the same.
+    """
+    checkpoint = None
+    if resume:
+        checkpoint = load_checkpoint(checkpoint_path, input_path)
+    if checkpoint:
+        translator = Translator.from_state(checkpoint['state'])
+        offset = checkpoint['offset']
+        out = open(output_path(checkpoint_path), 'r+b')
+        # Throw away anything written after the checkpoint.
+        out.truncate(checkpoint['output_size'])
+        out.seek(0, os.SEEK_END)
+    else:
+        # An old checkpoint would refer to output we're about to throw
+        # away.
+        remove_checkpoint(checkpoint_path)
+        translator = Translator(rules=rules)
+        offset = 0
+        out = open(output_path(checkpoint_path), 'w+b')
+
+    with out, open(input_path, 'rb') as f:
+        f.seek(offset)
+        if progress:
+            progress.start(offset, translator.transactions)
+        for raw in f:
+            offset += len(raw)
+            translator.translate_line(decode_line(raw))
+            if translator.lineno % every == 0:
+                save_checkpoint(checkpoint_path, input_path, offset,
+                                translator, out)
+            if progress and not translator.lineno % CHECK_EVERY:
+                progress.update(offset, translator)
+        if progress:
+            progress.finish(offset, translator)
+
+        translator.end_entry()
+        for line in translator.header():
+            stdout.write(line.encode('utf-8') + b'\n')
+        out.flush()
+        out.seek(0)
+        shutil.copyfileobj(out, stdout)
+        for line in translator.output:
+            stdout.write(line.encode('utf-8') + b'\n')
+        stdout.flush()
+
+    remove_checkpoint(checkpoint_path)
@@ -0,0 +1,108 @@
+"""Report how a long conversion is getting on.
+
+Progress is measured by how far through the input file we are, in
+bytes, so the estimated time remaining doesn't depend on how long the
+lines are. To keep the cost down, callers only check in every
+CHECK_EVERY lines, and a report is only written if at least
+`interval` seconds have passed since the last one.
+"""
+import json
+import sys
+import time
+
+# How many lines to translate between calls to Progress.update().
+CHECK_EVERY = 1024
+
+
+def format_bytes(n):
+    for unit in ['B', 'KiB', 'MiB']:
+        if n < 1024:
+            return '{:.1f} {}'.format(n, unit)
+        n /= 1024
+    return '{:.1f} GiB'.format(n)
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return '{}h{:02d}m{:02d}s'.format(hours, minutes, seconds)
+    if minutes:
+        return '{}m{:02d}s'.format(minutes, seconds)
+    return '{}s'.format(seconds)
+
+
+class Progress(object):
+    """Write progress reports about translating a file of `total_bytes`.
+
+    Reports are human-readable lines, or with `json_lines`, one JSON
+    object per line. They go to `stream`, or if that isn't given, to
+    whatever sys.stderr is at the time.
+    """
+    def __init__(self, total_bytes, stream=None, json_lines=False,
+                 interval=1.0, clock=time.monotonic):
+        self.total_bytes = total_bytes
+        self.stream = stream
+        self.json_lines = json_lines
+        self.interval = interval
+        self.clock = clock
+        self.start(0)
+
+    def start(self, offset, transactions=0):
+        """Start the clock, with everything before `offset` already done.
+
+        `transactions` is how many transactions that was, so that the
+        rate only counts the ones translated from here on.
+        """
+        self.start_time = self.last_report = self.clock()
+        self.start_offset = offset
+        self.start_transactions = transactions
+
+    def update(self, offset, translator):
+        now = self.clock()
+        if now - self.last_report < self.interval:
+            return
+        self.last_report = now
+        self.report(now, offset, translator, done=False)
+
+    def finish(self, offset, translator):
+        self.report(self.clock(), offset, translator, done=True)
+
+    def report(self, now, offset, translator, done):
+        stream = self.stream or sys.stderr
+        elapsed = now - self.start_time
+        remaining = None
+        transactions_per_sec = None
+        if elapsed > 0:
+            transactions_per_sec = (
+                translator.transactions - self.start_transactions) / elapsed
+            bytes_per_sec = (offset - self.start_offset) / elapsed
+            if bytes_per_sec > 0:
+                remaining = (self.total_bytes - offset) / bytes_per_sec
+
+        if self.json_lines:
+            stream.write(json.dumps({
+                'bytes': offset,
+                'total_bytes': self.total_bytes,
+                'lines': translator.lineno,
+                'transactions': translator.transactions,
+                'transactions_per_sec': transactions_per_sec,
+                'elapsed': elapsed,
+                'eta': remaining,
+                'done': done,
+            }) + '\n')
+        else:
+            percent = 100.0
+            if self.total_bytes:
+                percent = 100.0 * offset / self.total_bytes
+            message = '{} / {} ({:.1f}%), line {}, {} transactions'.format(
+                format_bytes(offset), format_bytes(self.total_bytes),
+                percent, translator.lineno, translator.transactions)
+            if transactions_per_sec is not None:
+                message += ' ({:.0f}/s)'.format(transactions_per_sec)
+            if done:
+                message += ', done in {}'.format(format_duration(elapsed))
+            elif remaining is not None:
+                message += ', ETA {}'.format(format_duration(remaining))
+            stream.write(message + '\n')
+        stream.flush()
@@ -0,0 +1,88 @@
+"""Rewriting account names by prefix.
+
+Both `alias` directives and the entries in a rules file map one
+account prefix to another: with a rule `Food = Expenses:Food`, the
+account `Food:Groceries` becomes `Expenses:Food:Groceries`. Prefixes
+only match whole components, and when several rules match, the
+longest prefix wins.
+
+A rules file has one `source = destination` entry per line. Blank
+lines and lines starting with `;` or `#` are ignored.
+"""
+
+# Key under which a trie node keeps its replacement. Account
+# components are always strings, so this can't clash with one.
+REPLACEMENT = None
+
+
+class InvalidRuleError(Exception):
+    """Exception signaling a line in a rules file we can't make sense of."""
+    def __init__(self, path, lineno):
+        self.path = path
+        self.lineno = lineno
+
+
+class AccountTrie(object):
+    """A set of prefix rewrite rules, stored as a trie of components.
+
+    Rewriting an account only has to walk as far down the trie as the
+    account is deep, however many rules there are.
+    """
+    def __init__(self, rules=()):
+        self.root = {}
+        for (prefix, replacement) in rules:
+            self.add(prefix, replacement)
+
+    def add(self, prefix, replacement):
+        node = self.root
+        for component in prefix.split(':'):
+            node = node.setdefault(component, {})
+        node[REPLACEMENT] = replacement
+
+    def match(self, account):
+        """Rewrite `account`, or return None if no rule matches it."""
+        components = account.split(':')
+        node = self.root
+        match = None
+        for depth, component in enumerate(components, 1):
+            node = node.get(component)
+            if node is None:
+                break
+            if REPLACEMENT in node:
+                match = (depth, node[REPLACEMENT])
+
+        if match is None:
+            return None
+        (depth, replacement) = match
+        return ':'.join([replacement] + components[depth:])
+
+    def rewrite(self, account):
+        """Rewrite `account`, leaving it alone if no rule matches it."""
+        rewritten = self.match(account)
+        return account if rewritten is None else rewritten
+
+
+def parse_rule(line):
+    """Parse `source = destination`, returning None if it isn't one."""
+    if '=' not in line:
+        return None
+    (source, destination) = line.split('=', 1)
+    (source, destination) = (source.strip(), destination.strip())
+    if not source or not destination:
+        return None
+    return (source, destination)
+
+
+def load_rules(path):
+    """Read a rules file, returning a list of (source, destination)."""
+    rules = []
+    with open(path, encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line[0] in ';#':
+                continue
+            rule = parse_rule(line)
+            if rule is None:
+                raise InvalidRuleError(path, lineno)
+            rules.append(rule)
+    return rules
@@ -0,0 +1,271 @@
+"""Serve conversions over HTTP, from a pool of already-running workers.
+
+Starting the interpreter and importing everything takes longer than
+converting a small file, so tools that convert a lot of files can
+instead talk to a long-running server:
+
+  POST /convert   Body is either ledger text, or a JSON object with
+                  a "text" or a "path" key (Content-Type:
+                  application/json). The response is the translated
+                  file.
+  GET /health     Answers "ok" once the workers are up.
+
+Errors come back as JSON objects with an "error" key naming the
+exception, plus whatever it knows, such as the 1-based "lineno" for a
+BalanceAssertionTooComplicated or "unit" for an InvalidCommodityError.
+
+The server listens on a Unix socket, or on a port on localhost. Only
+the Unix socket accepts "path" requests, since anything that can
+reach a port on localhost, including a web page, could otherwise have
+the server read out any file it can open. For the same reason, the
+port refuses requests whose Host header names anything other than
+localhost, so that a web page can't get at it by rebinding its own
+domain name to 127.0.0.1.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+
+from . import (
+    translate_file, decode_line, BalanceAssertionTooComplicated,
+    InvalidCommodityError
+)
+
+DEFAULT_PORT = 8718
+
+# What the Host header may say, port aside, when listening on a port.
+LOCAL_HOSTS = {'localhost', '127.0.0.1'}
+
+# How many output lines to send per chunk.
+CHUNK_LINES = 1000
+
+WARM_UP_LEDGER = [
+    '2017-01-02 Warming up\n',
+    '    Assets:Broker    10 DJIA @ $13.01\n',
+    '    Assets:Cash\n',
+]
+
+
+def warm_up():
+    translate_file(WARM_UP_LEDGER)
+    return os.getpid()
+
+
+def convert(request):
+    """Run one conversion request; this is what the workers do."""
+    try:
+        if 'path' in request:
+            with open(request['path'], 'rb') as f:
+                lines = [decode_line(raw) for raw in f]
+        else:
+            lines = request['text'].splitlines(True)
+        return {'output': translate_file(lines)}
+    except BalanceAssertionTooComplicated as e:
+        return {'error': 'BalanceAssertionTooComplicated',
+                'lineno': e.lineno + 1}
+    except InvalidCommodityError as e:
+        return {'error': 'InvalidCommodityError', 'unit': e.unit}
+    except OSError as e:
+        return {'error': type(e).__name__, 'message': str(e)}
+
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def address_string(self):
+        # Unix sockets don't have (host, port) addresses.
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return self.server.server_address
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super(ConversionHandler, self).log_message(format, *args)
+
+    def send_json(self, code, body):
+        content = json.dumps(body).encode('utf-8') + b'\n'
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_lines(self, lines):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for start in range(0, len(lines), CHUNK_LINES):
+            chunk = ''.join(line + '\n'
+                            for line in lines[start:start + CHUNK_LINES])
+            chunk = chunk.encode('utf-8')
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+        self.wfile.write(b'0\r\n\r\n')
+
+    def check_host(self):
+        """Refuse the request, unless it's addressed to localhost."""
+        if not self.server.check_host:
+            return True
+        host = self.headers.get('Host', '')
+        if ':' in host:
+            host = host.rsplit(':', 1)[0]
+        if host in LOCAL_HOSTS:
+            return True
+        self.send_json(403, {'error': 'Forbidden',
+                             'message': 'unexpected Host header'})
+        return False
+
+    def do_GET(self):
+        if not self.check_host():
+            return
+        if self.path != '/health':
+            self.send_json(404, {'error': 'NotFound', 'path': self.path})
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', '3')
+        self.end_headers()
+        self.wfile.write(b'ok\n')
+
+    def read_request(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8')
+        if self.headers.get_content_type() != 'application/json':
+            return {'text': body}
+
+        request = json.loads(body)
+        if not isinstance(request, dict):
+            raise ValueError('expected a JSON object')
+        if isinstance(request.get('text'), str):
+            return {'text': request['text']}
+        if isinstance(request.get('path'), str):
+            return {'path': request['path']}
+        raise ValueError('expected a "text" or "path" string')
+
+    def do_POST(self):
+        if not self.check_host():
+            return
+        if self.path != '/convert':
+            self.send_json(404, {'error': 'NotFound', 'path': self.path})
+            return
+        try:
+            request = self.read_request()
+        except ValueError as e:
+            self.send_json(400, {'error': 'BadRequest', 'message': str(e)})
+            return
+        if 'path' in request and not self.server.allow_paths:
+            self.send_json(403, {
+                'error': 'Forbidden',
+                'message': 'paths are only accepted over a Unix socket'})
+            return
+
+        try:
+            result = self.server.pool.submit(convert, request).result()
+        except Exception as e:
+            self.send_json(500, {'error': type(e).__name__,
+                                 'message': str(e)})
+            return
+
+        if 'error' in result:
+            self.send_json(422, result)
+        else:
+            self.send_lines(result['output'])
+
+
+class ConversionServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    check_host = True
+    allow_paths = False
+
+    def __init__(self, address, pool, verbose=False):
+        self.pool = pool
+        self.verbose = verbose
+        HTTPServer.__init__(self, address, ConversionHandler)
+
+
+class UnixConversionServer(ConversionServer):
+    address_family = socket.AF_UNIX
+    # Only processes that can open the socket file can connect.
+    check_host = False
+    allow_paths = True
+
+    def server_bind(self):
+        # Skip HTTPServer.server_bind, which wants a host and port.
+        socketserver.TCPServer.server_bind(self)
+        self.server_name = self.server_address
+        self.server_port = None
+
+
+class UnixHTTPConnection(HTTPConnection):
+    """An HTTPConnection that talks to a Unix socket, for clients."""
+    def __init__(self, path, timeout=None):
+        HTTPConnection.__init__(self, 'localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def start_pool(workers):
+    """Start `workers` processes, and make sure they're ready to go."""
+    pool = ProcessPoolExecutor(max_workers=workers)
+    futures = [pool.submit(warm_up) for _ in range(workers)]
+    for future in futures:
+        future.result()
+    return pool
+
+
+def make_server(pool, socket_path=None, port=DEFAULT_PORT, verbose=False):
+    if socket_path is None:
+        return ConversionServer(('127.0.0.1', port), pool, verbose=verbose)
+
+    # Clean up after a server that didn't exit cleanly.
+    if (os.path.exists(socket_path) and
+            stat.S_ISSOCK(os.stat(socket_path).st_mode)):
+        os.remove(socket_path)
+    return UnixConversionServer(socket_path, pool, verbose=verbose)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='ledger-to-beancount serve',
+        description='Serve ledger-to-beancount conversions over HTTP.')
+    parser.add_argument(
+        '--socket', metavar='PATH',
+        help='listen on a Unix socket at PATH instead of a port')
+    parser.add_argument(
+        '--port', type=int, default=DEFAULT_PORT,
+        help='port to listen on, on localhost (default: %(default)s)')
+    parser.add_argument(
+        '--workers', type=int, default=os.cpu_count() or 1,
+        help='number of worker processes (default: %(default)s)')
+    parser.add_argument(
+        '--verbose', action='store_true', help='log every request')
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    pool = start_pool(args.workers)
+    server = make_server(pool, socket_path=args.socket, port=args.port,
+                         verbose=args.verbose)
+    print("Listening on {} with {} workers.".format(
+        args.socket or 'http://127.0.0.1:{}/'.format(server.server_port),
+        args.workers), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.shutdown()
+        if args.socket:
+            os.remove(args.socket)
+    return 0
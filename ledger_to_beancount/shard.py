@@ -0,0 +1,159 @@
+"""Split translated output into several files.
+
+Each entry goes into a shard chosen by its year, or by the top-level
+account of its first posting. Anything that isn't an entry, such as
+comments and blank lines, stays with the entry before it. Anything
+before the first entry goes into the root file, which also holds the
+account openings and an `include` for every shard.
+
+Shards are written concurrently, and a shard whose content hasn't
+changed since the last run is left alone, so re-running a conversion
+only touches the files that actually changed.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+import re
+
+from . import Translator
+
+ROOT_FILENAME = 'main.beancount'
+
+INCLUDE_RE = re.compile(r'^include "([^"]+)"$', re.MULTILINE)
+
+
+def year_of(entry):
+    # Entries always start with an ISO date.
+    return entry[0][:4]
+
+
+def top_level_account_of(entry):
+    first = entry[0].split()
+    if len(first) > 2 and first[1] == 'balance':
+        return first[2].split(':', 1)[0]
+    for line in entry[1:]:
+        posting = line.split()
+        if posting and not posting[0].startswith(';'):
+            return posting[0].split(':', 1)[0]
+    return None
+
+
+SHARD_KEYS = {
+    'year': year_of,
+    'account': top_level_account_of,
+}
+
+
+class ShardingTranslator(Translator):
+    """A Translator that files each entry under a shard.
+
+    `shard_key` is a function that takes an entry (as a list of
+    translated lines) and returns the name of its shard, or None to
+    keep it with the entry before it.
+    """
+    def __init__(self, shard_key, **kwargs):
+        super(ShardingTranslator, self).__init__(**kwargs)
+        self.shard_key = shard_key
+        self.preamble = []
+        self.shards = {}
+        self.current_shard = self.preamble
+
+    def end_entry(self):
+        if not self.current_entry:
+            return
+        # Whatever came between the last entry and this one goes with
+        # the last entry.
+        self.current_shard.extend(self.output)
+        self.output = []
+
+        key = self.shard_key(self.current_entry)
+        if key is not None:
+            self.current_shard = self.shards.setdefault(key, [])
+        super(ShardingTranslator, self).end_entry()
+        self.current_shard.extend(self.output)
+        self.output = []
+
+    def finish(self):
+        self.end_entry()
+        self.current_shard.extend(self.output)
+        self.output = []
+        return self.shards
+
+
+def shard_filename(key):
+    return '{}.beancount'.format(key)
+
+
+def write_if_changed(path, lines):
+    """Write `lines` to `path`, unless that's what it already says.
+
+    Returns True if the file was written.
+    """
+    content = ''.join(line + '\n' for line in lines).encode('utf-8')
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return True
+
+
+def previous_includes(root_path):
+    try:
+        with open(root_path, encoding='utf-8') as f:
+            return set(INCLUDE_RE.findall(f.read()))
+    except FileNotFoundError:
+        return set()
+
+
+def translate_file_to_shards(file_lines, output_dir, shard_by='year',
+                             max_workers=None, rules=()):
+    """Translate `file_lines` into a root file and shards in `output_dir`.
+
+    Returns the list of paths that were (re)written.
+    """
+    translator = ShardingTranslator(SHARD_KEYS[shard_by], rules=rules)
+    for line in file_lines:
+        translator.translate_line(line)
+    return write_shards(translator, output_dir, max_workers=max_workers)
+
+
+def write_shards(translator, output_dir, max_workers=None):
+    """Write out everything `translator` has translated.
+
+    Returns the list of paths that were (re)written.
+    """
+    shards = translator.finish()
+
+    os.makedirs(output_dir, exist_ok=True)
+    root_path = os.path.join(output_dir, ROOT_FILENAME)
+    filenames = {key: shard_filename(key) for key in shards}
+
+    root = translator.header() + translator.preamble + [
+        'include "{}"'.format(filenames[key]) for key in sorted(shards)
+    ]
+
+    files = [(os.path.join(output_dir, filenames[key]), lines)
+             for key, lines in shards.items()]
+    files.append((root_path, root))
+
+    # Shards that the last run wrote, but this one didn't.
+    stale = previous_includes(root_path) - set(filenames.values())
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        written = list(executor.map(lambda f: write_if_changed(*f), files))
+
+    for filename in stale:
+        if os.path.basename(filename) != filename:
+            # Not something we would have written.
+            continue
+        path = os.path.join(output_dir, filename)
+        if os.path.exists(path):
+            os.remove(path)
+
+    return [path for ((path, _), changed) in zip(files, written) if changed]
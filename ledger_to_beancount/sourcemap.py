@@ -0,0 +1,176 @@
+"""Map lines of translated output back to the ledger lines they came from.
+
+Almost every input line produces exactly one output line, so the map
+is stored as runs: each run says "output lines from here on come from
+consecutive input lines starting there", and only a line that breaks
+the pattern starts a new run. The runs are kept in two arrays, sorted
+by output line, so looking up a line is a binary search.
+
+On disk, a source map is a small header followed by both arrays, as
+little-endian 64-bit integers. The lookup command maps the file
+rather than reading it, so it answers immediately however big the
+translated file was.
+
+Line numbers are 1-based on the way in and out, to match what
+bean-check reports and what editors show.
+"""
+import argparse
+import array
+import bisect
+import mmap
+import struct
+import sys
+
+from . import Translator
+
+MAGIC = b'L2BSMAP2'
+# Magic, number of header lines, total number of lines, number of runs.
+HEADER = struct.Struct('<8sqqq')
+
+
+class SourceMapTranslator(Translator):
+    """A Translator that remembers where each output line came from."""
+    def __init__(self, **kwargs):
+        super(SourceMapTranslator, self).__init__(**kwargs)
+        # Output positions here don't count the header, which we
+        # won't know the size of until the end.
+        self.output_starts = array.array('q')
+        self.input_starts = array.array('q')
+        self.produced = 0
+
+    def translate_line(self, line):
+        lineno = self.lineno
+        in_balance_assertion = self.in_balance_assertion
+        super(SourceMapTranslator, self).translate_line(line)
+        if self.in_balance_assertion and not in_balance_assertion:
+            # The assertion replaced the transaction's first line.
+            self.map_entry_start_to(lineno)
+            return
+        produced = len(self.output) + len(self.current_entry)
+        if produced == self.produced:
+            return
+
+        if self.output_starts:
+            run_length = self.produced - self.output_starts[-1]
+            if self.input_starts[-1] + run_length == lineno:
+                # Carries on from the last run.
+                self.produced = produced
+                return
+
+        self.output_starts.append(self.produced)
+        self.input_starts.append(lineno)
+        self.produced = produced
+
+    def source_of(self, position):
+        run = bisect.bisect_right(self.output_starts, position) - 1
+        return self.input_starts[run] + position - self.output_starts[run]
+
+    def map_entry_start_to(self, lineno):
+        """Make the current entry's first line map to `lineno`.
+
+        The rest of the entry keeps mapping to where it did.
+        """
+        start = self.produced - len(self.current_entry)
+        following = None
+        if start + 1 < self.produced:
+            following = self.source_of(start + 1)
+        while self.output_starts and self.output_starts[-1] >= start:
+            self.output_starts.pop()
+            self.input_starts.pop()
+        self.output_starts.append(start)
+        self.input_starts.append(lineno)
+        if following is not None:
+            self.output_starts.append(start + 1)
+            self.input_starts.append(following)
+
+    def write_source_map(self, f):
+        """Write the source map for finish()'s output to binary file `f`."""
+        header_lines = len(self.header())
+        f.write(HEADER.pack(MAGIC, header_lines,
+                            header_lines + len(self.output),
+                            len(self.output_starts)))
+        for numbers in [self.output_starts, self.input_starts]:
+            if sys.byteorder != 'little':
+                numbers = array.array('q', numbers)
+                numbers.byteswap()
+            f.write(numbers.tobytes())
+
+
+class InvalidSourceMap(Exception):
+    """Exception signaling a file that isn't a source map."""
+    def __init__(self, path):
+        self.path = path
+
+
+class SourceMap(object):
+    """A source map file, opened for lookups."""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+            if len(header) != HEADER.size:
+                raise InvalidSourceMap(path)
+            (magic, self.header_lines, self.total_lines,
+             count) = HEADER.unpack(header)
+            if magic != MAGIC:
+                raise InvalidSourceMap(path)
+            if count == 0:
+                self.output_starts = self.input_starts = []
+                return
+
+            if sys.byteorder == 'little':
+                self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                numbers = memoryview(self.mmap)[HEADER.size:]
+            else:
+                numbers = array.array('q', f.read())
+                numbers.byteswap()
+                numbers = memoryview(numbers)
+
+        if len(numbers) != 2 * 8 * count:
+            raise InvalidSourceMap(path)
+        numbers = numbers.cast('q')
+        self.output_starts = numbers[:count]
+        self.input_starts = numbers[count:]
+
+    def lookup(self, output_line):
+        """Return the ledger line that produced `output_line`.
+
+        Returns None for lines that weren't produced by any one ledger
+        line, like account openings, and for lines past the end of the
+        output.
+        """
+        if output_line > self.total_lines:
+            return None
+        position = output_line - 1 - self.header_lines
+        if position < 0 or not len(self.output_starts):
+            return None
+        run = bisect.bisect_right(self.output_starts, position) - 1
+        if run < 0:
+            return None
+        return (self.input_starts[run] + position -
+                self.output_starts[run] + 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='ledger-to-beancount-sourcemap',
+        description='Find the ledger line that produced a line of output.')
+    parser.add_argument('source_map')
+    parser.add_argument('lines', metavar='line', type=int, nargs='+',
+                        help='line number in the translated output')
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    try:
+        source_map = SourceMap(args.source_map)
+    except InvalidSourceMap as e:
+        print("{} is not a source map.".format(e.path), file=sys.stderr)
+        return 1
+
+    for line in args.lines:
+        input_line = source_map.lookup(line)
+        print('-' if input_line is None else input_line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""Measure how many requests per second a conversion server can handle.
+
+Start a server with `ledger-to-beancount serve`, then run e.g.:
+
+  $ python scripts/loadtest.py --socket /tmp/l2b.sock -c 8 -n 1000 my.ledger
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+import json
+import os
+import sys
+import time
+
+from ledger_to_beancount.server import DEFAULT_PORT, UnixHTTPConnection
+
+
+def connect(args):
+    if args.socket:
+        return UnixHTTPConnection(args.socket)
+    return HTTPConnection('127.0.0.1', args.port)
+
+
+def make_request(args):
+    if args.send_path:
+        body = json.dumps({'path': os.path.abspath(args.ledger)})
+        return (body.encode('utf-8'), 'application/json')
+    with open(args.ledger, 'rb') as f:
+        return (f.read(), 'text/plain; charset=utf-8')
+
+
+def run_client(args, body, content_type, count):
+    connection = connect(args)
+    latencies = []
+    failures = 0
+    for _ in range(count):
+        start = time.perf_counter()
+        connection.request('POST', '/convert', body=body,
+                           headers={'Content-Type': content_type})
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        if response.status != 200:
+            failures += 1
+    connection.close()
+    return latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('ledger', help='ledger file to convert')
+    parser.add_argument('--socket', metavar='PATH',
+                        help='Unix socket the server is listening on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('-c', '--concurrency', type=int, default=4)
+    parser.add_argument('-n', '--requests', type=int, default=200,
+                        help='total number of requests')
+    parser.add_argument('--send-path', action='store_true',
+                        help='send the path to the file, not its contents')
+    args = parser.parse_args()
+
+    body, content_type = make_request(args)
+    counts = [args.requests // args.concurrency] * args.concurrency
+    for i in range(args.requests % args.concurrency):
+        counts[i] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(
+            lambda count: run_client(args, body, content_type, count),
+            counts))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(l for (ls, _) in results for l in ls)
+    failures = sum(f for (_, f) in results)
+    print('{} requests in {:.2f}s: {:.1f} requests/sec, {} failed'.format(
+        len(latencies), elapsed, len(latencies) / elapsed, failures))
+    for percentile in [50, 90, 99]:
+        index = min(len(latencies) - 1, len(latencies) * percentile // 100)
+        print('p{}: {:.1f} ms'.format(percentile, 1000 * latencies[index]))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -10,6 +10,10 @@ requirements = [
 setup_requirements = [
 ]
 
+extras_requirements = {
+    'numpy': ['numpy'],
+}
+
 test_requirements = [
     'pytest',
 ]
@@ -17,6 +21,7 @@ test_requirements = [
 entry_points = {
     'console_scripts': [
         'ledger-to-beancount = ledger_to_beancount.__main__:main',
+        'ledger-to-beancount-sourcemap = ledger_to_beancount.sourcemap:main',
     ]
 }
 
@@ -41,6 +46,7 @@ setup(name='ledger-to-beancount',
       packages=find_packages(),
       test_suite='tests',
       install_requires=requirements,
+      extras_require=extras_requirements,
       tests_require=test_requirements,
       setup_requires=setup_requirements,
       entry_points=entry_points,
@@ -0,0 +1,90 @@
+from decimal import Decimal
+
+from ledger_to_beancount import translate_file
+from ledger_to_beancount.balance import BalanceChecker, Imbalance
+
+from .test_functional import from_triple_quoted_string
+
+
+def check(s):
+    checker = BalanceChecker()
+    translate_file(from_triple_quoted_string(s), listeners=[checker])
+    return checker
+
+
+def test_balanced_transactions():
+    checker = check("""
+    2017-01-02 An ordinary transaction
+        Expenses:Restaurants    $40
+        Assets:Cash    $-40
+
+    2017-01-03 Shares
+        Assets:Broker    10 DJIA @ $13.01
+        Assets:Cash    $-130.10
+
+    2017-01-04 Selling shares
+        Assets:Broker    -5 DJIA @ $14
+        Assets:Cash    $70
+
+    2017-01-05 Blah blah
+        Assets:Cash   = $40
+    """)
+    assert checker.imbalances == []
+
+
+def test_unbalanced_transaction_is_reported_with_its_line():
+    checker = check("""
+    2017-01-02 An ordinary transaction
+        Expenses:Restaurants    $40
+        Assets:Cash    $-40
+
+    2017-01-03 Shares
+        Assets:Broker    10 DJIA @ $13.01
+        Assets:Cash    $-130
+    """)
+    assert checker.imbalances == [
+        Imbalance(5, {'USD': Decimal('0.10')}, 0)]
+    assert str(checker.imbalances[0]) == \
+        "Transaction on line 5: doesn't balance by 0.10 USD"
+
+
+def test_small_differences_are_tolerated():
+    checker = check("""
+    2017-01-03 Shares
+        Assets:Broker    1.234 DJIA @ $13.01
+        Assets:Cash    $-16.05
+    """)
+    assert checker.imbalances == []
+
+
+def test_whole_numbers_must_balance_exactly():
+    checker = check("""
+    2017-01-02 Sheep
+        Assets:Farm    3 SHEEP
+        Assets:Barn    -2 SHEEP
+    """)
+    assert checker.imbalances == [Imbalance(1, {'SHEEP': Decimal(1)}, 0)]
+
+
+def test_elided_posting_is_inferred():
+    checker = check("""
+    2017-01-03 Shares
+        Assets:Broker    10 DJIA @ $13.01
+        Expenses:Fees    €2
+        Assets:Cash
+    """)
+    assert checker.imbalances == []
+    assert checker.inferred == {
+        'USD': Decimal('-130.10'), 'EUR': Decimal('-2')}
+
+
+def test_two_elided_postings_are_reported():
+    checker = check("""
+    2017-01-02 An ordinary transaction
+        Expenses:Restaurants    $40
+        Assets:Cash
+        Assets:Wallet
+    """)
+    assert checker.imbalances == [Imbalance(1, {'USD': Decimal(40)}, 2)]
+    assert str(checker.imbalances[0]) == \
+        'Transaction on line 1: 2 postings without amounts'
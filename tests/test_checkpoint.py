@@ -0,0 +1,131 @@
+import io
+import os
+
+import pytest
+
+from ledger_to_beancount import translate_file, Translator
+from ledger_to_beancount import checkpoint
+
+
+LEDGER = """\
+; A file with a bit of everything
+alias Food=Expenses:Food and Drink
+
+2017-01-02 Groceries
+    Food    $40
+    Assets:Cash
+
+2017-01-03 Shares
+    Assets:Broker    10 DJIA @ $13.01
+    Assets:Cash
+
+2017-01-04 Blah blah
+    Assets:Cash   = $40
+"""
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def ledger_file(tmpdir):
+    path = tmpdir.join('input.ledger')
+    path.write_binary(LEDGER.encode('utf-8'))
+    return str(path)
+
+
+def expected_output():
+    lines = translate_file(LEDGER.splitlines(True))
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def test_output_matches_translate_file(ledger_file, tmpdir):
+    checkpoint_path = str(tmpdir.join('checkpoint'))
+    stdout = io.BytesIO()
+    checkpoint.translate_with_checkpoints(ledger_file, checkpoint_path,
+                                          stdout, every=2)
+    assert stdout.getvalue() == expected_output()
+    assert not os.path.exists(checkpoint_path)
+    assert not os.path.exists(checkpoint.output_path(checkpoint_path))
+
+
+def interrupted_run(ledger_file, checkpoint_path, monkeypatch, stop_at,
+                    **kwargs):
+    translate_line = Translator.translate_line
+
+    def dying_translate_line(self, line):
+        if self.lineno == stop_at:
+            raise Interrupted()
+        translate_line(self, line)
+
+    monkeypatch.setattr(Translator, 'translate_line', dying_translate_line)
+    with pytest.raises(Interrupted):
+        checkpoint.translate_with_checkpoints(ledger_file, checkpoint_path,
+                                              io.BytesIO(), **kwargs)
+    monkeypatch.undo()
+
+
+@pytest.mark.parametrize('stop_at', [3, 5, 9, 12])
+def test_resume_matches_uninterrupted_run(ledger_file, tmpdir, monkeypatch,
+                                          stop_at):
+    checkpoint_path = str(tmpdir.join('checkpoint'))
+    interrupted_run(ledger_file, checkpoint_path, monkeypatch, stop_at,
+                    every=2)
+
+    stdout = io.BytesIO()
+    checkpoint.translate_with_checkpoints(ledger_file, checkpoint_path,
+                                          stdout, every=2, resume=True)
+    assert stdout.getvalue() == expected_output()
+
+
+def test_resume_refuses_changed_input(ledger_file, tmpdir):
+    checkpoint_path = str(tmpdir.join('checkpoint'))
+    with open(checkpoint.output_path(checkpoint_path), 'wb') as out:
+        checkpoint.save_checkpoint(checkpoint_path, ledger_file, 0,
+                                   Translator(), out)
+
+    with open(ledger_file, 'ab') as f:
+        f.write(b'; one more line\n')
+
+    with pytest.raises(checkpoint.CheckpointMismatch):
+        checkpoint.translate_with_checkpoints(
+            ledger_file, checkpoint_path, io.BytesIO(), resume=True)
+
+
+def test_resume_without_checkpoint_starts_from_scratch(ledger_file, tmpdir):
+    checkpoint_path = str(tmpdir.join('checkpoint'))
+    stdout = io.BytesIO()
+    checkpoint.translate_with_checkpoints(ledger_file, checkpoint_path,
+                                          stdout, every=2, resume=True)
+    assert stdout.getvalue() == expected_output()
+    assert not os.path.exists(checkpoint_path)
+
+
+def test_fresh_run_discards_old_checkpoint(ledger_file, tmpdir, monkeypatch):
+    checkpoint_path = str(tmpdir.join('checkpoint'))
+    interrupted_run(ledger_file, checkpoint_path, monkeypatch, 9, every=4)
+    # Starting over dies before its first checkpoint.
+    interrupted_run(ledger_file, checkpoint_path, monkeypatch, 2, every=4)
+
+    stdout = io.BytesIO()
+    checkpoint.translate_with_checkpoints(ledger_file, checkpoint_path,
+                                          stdout, every=4, resume=True)
+    assert stdout.getvalue() == expected_output()
+
+
+@pytest.mark.parametrize('output', [None, b''])
+def test_resume_refuses_missing_output(ledger_file, tmpdir, monkeypatch,
+                                       output):
+    checkpoint_path = str(tmpdir.join('checkpoint'))
+    interrupted_run(ledger_file, checkpoint_path, monkeypatch, 9, every=4)
+    out_path = checkpoint.output_path(checkpoint_path)
+    if output is None:
+        os.remove(out_path)
+    else:
+        with open(out_path, 'wb') as f:
+            f.write(output)
+
+    with pytest.raises(checkpoint.CheckpointMismatch):
+        checkpoint.translate_with_checkpoints(
+            ledger_file, checkpoint_path, io.BytesIO(), resume=True)
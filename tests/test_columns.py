@@ -0,0 +1,97 @@
+import csv
+
+import pytest
+
+from ledger_to_beancount import translate_file
+from ledger_to_beancount import columns
+
+from .test_functional import from_triple_quoted_string
+
+
+LEDGER = from_triple_quoted_string("""
+2017-01-02 Groceries
+    Expenses:Food    $40
+    Assets:Cash
+
+2017-01-03 Shares
+    Assets:Broker    10 DJIA @ $13.01
+    Assets:Cash    $-130.10
+
+2017-01-04 Selling
+    Assets:Broker    -5 DJIA @ $14
+    Assets:Cash
+""")
+
+
+class ListWriter(object):
+    def __init__(self):
+        self.batches = []
+
+    def write_batch(self, columns):
+        self.batches.append([list(column) for column in columns])
+
+    def close(self, account_names, commodity_names):
+        self.account_names = account_names
+        self.commodity_names = commodity_names
+
+
+def read_csv(path):
+    with open(path, newline='') as f:
+        return list(csv.reader(f))
+
+
+def test_postings_are_batched_and_interned():
+    writer = ListWriter()
+    posting_columns = columns.PostingColumns(writer, batch_size=4)
+    translate_file(LEDGER, listeners=[posting_columns])
+    posting_columns.close()
+
+    assert [len(batch[0]) for batch in writer.batches] == [4, 2]
+    assert writer.account_names == [
+        'Expenses:Food', 'Assets:Cash', 'Assets:Broker']
+    assert writer.commodity_names == ['USD', 'DJIA']
+
+    accounts = [code for batch in writer.batches for code in batch[2]]
+    assert accounts == [0, 1, 2, 1, 2, 1]
+
+
+def test_csv(tmpdir):
+    path = str(tmpdir.join('postings.csv'))
+    posting_columns = columns.PostingColumns(columns.open_writer(path))
+    translate_file(LEDGER, listeners=[posting_columns])
+    posting_columns.close()
+
+    assert read_csv(path) == [
+        ['date', 'lineno', 'account', 'number', 'commodity',
+         'cost_number', 'cost_commodity', 'price_number', 'price_commodity'],
+        ['17168', '2', '0', '40', '0', '', '-1', '', '-1'],
+        ['17168', '3', '1', '', '-1', '', '-1', '', '-1'],
+        ['17169', '6', '2', '10', '1', '13.01', '0', '', '-1'],
+        ['17169', '7', '1', '-130.10', '0', '', '-1', '', '-1'],
+        ['17170', '10', '2', '-5', '1', '', '-1', '14', '0'],
+        ['17170', '11', '1', '', '-1', '', '-1', '', '-1'],
+    ]
+    assert read_csv(path + '.accounts.csv') == [
+        ['code', 'name'], ['0', 'Expenses:Food'], ['1', 'Assets:Cash'],
+        ['2', 'Assets:Broker']]
+    assert read_csv(path + '.commodities.csv') == [
+        ['code', 'name'], ['0', 'USD'], ['1', 'DJIA']]
+
+
+def test_npz(tmpdir):
+    numpy = pytest.importorskip('numpy')
+    path = str(tmpdir.join('postings.npz'))
+    posting_columns = columns.PostingColumns(columns.open_writer(path),
+                                             batch_size=4)
+    translate_file(LEDGER, listeners=[posting_columns])
+    posting_columns.close()
+
+    data = numpy.load(path)
+    assert list(data['account_names']) == [
+        'Expenses:Food', 'Assets:Cash', 'Assets:Broker']
+    assert str(data['date'][0]) == '2017-01-02'
+    assert list(data['lineno']) == [2, 3, 6, 7, 10, 11]
+    usd = data['commodity'] == 0
+    balances = numpy.bincount(data['account'][usd],
+                              weights=data['number'][usd])
+    assert list(balances) == [40.0, -130.1]
@@ -1,7 +1,8 @@
 import pytest
 
+import ledger_to_beancount
 from ledger_to_beancount import (
-    translate_file, BalanceAssertionTooComplicated,
+    translate_file, classify_line, BalanceAssertionTooComplicated,
     InvalidCommodityError
 )
 
@@ -510,3 +511,173 @@ def test_barf_on_commodities_with_numbers():
     """)
     with pytest.raises(InvalidCommodityError):
         translate_file(input)
+
+
+@pytest.mark.parametrize('line,kind', [
+    ('', 'BLANK'),
+    ('; Comment', 'COMMENT'),
+    ('# Comment', 'COMMENT'),
+    ('% Comment', 'COMMENT'),
+    ('| Comment', 'COMMENT'),
+    ('* Org heading', 'COMMENT'),
+    ('    Assets:Cash    $40', 'POSTING'),
+    ('\tAssets:Cash    $40', 'POSTING'),
+    ('    ', 'POSTING'),
+    ('2017-01-02 Payee', 'TRANSACTION'),
+    ('2017/1/2=2017/1/5 Payee', 'TRANSACTION'),
+    ('2/6/2010', 'TRANSACTION'),
+    ('2017 was a good year', 'PASSTHROUGH'),
+    ('alias Food=Expenses:Food', 'ALIAS'),
+    ('aliasX Food=Expenses:Food', 'DIRECTIVE'),
+    ('apply account Personal', 'APPLY'),
+    ('apply tag hastag', 'APPLY'),
+    ('account Assets:Cash', 'DIRECTIVE'),
+    ('end apply account', 'END_APPLY'),
+    ('end apply', 'END_APPLY'),
+    ('end', 'DIRECTIVE'),
+    ('commodity USD', 'DIRECTIVE'),
+    ('!include other.ledger', 'PASSTHROUGH'),
+])
+def test_classify_line(line, kind):
+    assert classify_line(line) == getattr(ledger_to_beancount, kind)
+
+
+def test_tab_indented_postings_continue_the_transaction():
+    input = from_triple_quoted_string("""
+    2017-01-02 An ordinary transaction
+    \tExpenses:Restaurants    40 USD
+    \tAssets:Cash
+    """)
+    output = translate_file(input)
+    assert output == from_triple_quoted_string("""
+    * Accounts
+    2010-01-01 open Assets:Cash
+    2010-01-01 open Expenses:Restaurants
+    * Transactions
+    2017-01-02 * "An ordinary transaction"
+      Expenses:Restaurants        40 USD
+      Assets:Cash
+    """)
+
+
+def test_lines_that_only_look_like_dates_are_copied_through():
+    input = from_triple_quoted_string("""
+    2017 was a good year
+    99/99/99 was not a date
+    """)
+    output = translate_file(input)
+    assert output == from_triple_quoted_string("""
+    * Accounts
+    * Transactions
+    2017 was a good year
+    99/99/99 was not a date
+    """)
+
+
+def test_aliases_apply_to_subaccounts():
+    input = from_triple_quoted_string("""
+    alias Food=Expenses:Food and Drink
+    2017-01-02 An ordinary transaction
+        Food:Eating Out    40 USD
+        Food
+        Foodstuffs
+    """)
+    output = translate_file(input)
+    assert output == from_triple_quoted_string("""
+    * Accounts
+    2010-01-01 open Expenses:FoodandDrink
+    2010-01-01 open Expenses:FoodandDrink:EatingOut
+    2010-01-01 open Foodstuffs
+    * Transactions
+    2017-01-02 * "An ordinary transaction"
+      Expenses:FoodandDrink:EatingOut        40 USD
+      Expenses:FoodandDrink
+      Foodstuffs
+    """)
+
+
+def test_rules_rewrite_account_prefixes():
+    input = from_triple_quoted_string("""
+    2017-01-02 An ordinary transaction
+        Food:Eating Out    40 USD
+        Visa
+    """)
+    output = translate_file(input, rules=[
+        ('Food', 'Expenses:Food'),
+        ('Food:Eating Out', 'Expenses:Restaurants'),
+        ('Visa', 'Liabilities:Credit Card'),
+    ])
+    assert output == from_triple_quoted_string("""
+    * Accounts
+    2010-01-01 open Expenses:Restaurants
+    2010-01-01 open Liabilities:CreditCard
+    * Transactions
+    2017-01-02 * "An ordinary transaction"
+      Expenses:Restaurants        40 USD
+      Liabilities:CreditCard
+    """)
+
+
+def test_apply_account():
+    input = from_triple_quoted_string("""
+    apply account Personal
+    alias Cash=Assets:Cash
+    2017-01-02 An ordinary transaction
+        Expenses:Restaurants    40 USD
+        Cash
+    end apply account
+    2017-01-03 Another transaction
+        Expenses:Restaurants    40 USD
+        Assets:Cash
+    """)
+    output = translate_file(input)
+    assert output == from_triple_quoted_string("""
+    * Accounts
+    2010-01-01 open Assets:Cash
+    2010-01-01 open Expenses:Restaurants
+    2010-01-01 open Personal:Expenses:Restaurants
+    * Transactions
+    2017-01-02 * "An ordinary transaction"
+      Personal:Expenses:Restaurants        40 USD
+      Assets:Cash
+    2017-01-03 * "Another transaction"
+      Expenses:Restaurants        40 USD
+      Assets:Cash
+    """)
+
+
+def test_aliases_take_precedence_over_apply_account():
+    input = from_triple_quoted_string("""
+    alias Food=Expenses:Food
+    apply account Personal
+    2017-01-02 An ordinary transaction
+        Food    $1
+        Cash
+    end apply account
+    """)
+    output = translate_file(input)
+    assert output == from_triple_quoted_string("""
+    * Accounts
+    2010-01-01 open Expenses:Food
+    2010-01-01 open Personal:Cash
+    * Transactions
+    2017-01-02 * "An ordinary transaction"
+      Expenses:Food        1 USD
+      Personal:Cash
+    """)
+
+
+def test_other_applies_are_copied_through():
+    input = from_triple_quoted_string("""
+    apply tag hastag
+    apply account Personal
+    end apply account
+    end apply tag
+    """)
+    output = translate_file(input)
+    assert output == from_triple_quoted_string("""
+    * Accounts
+    * Transactions
+    apply tag hastag
+    end apply tag
+    """)
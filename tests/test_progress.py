@@ -0,0 +1,81 @@
+import io
+import json
+
+from ledger_to_beancount import Translator
+from ledger_to_beancount.progress import Progress
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def translator_at(lineno, transactions):
+    translator = Translator()
+    translator.lineno = lineno
+    translator.transactions = transactions
+    return translator
+
+
+def test_reports_are_rate_limited():
+    clock = FakeClock()
+    stream = io.StringIO()
+    progress = Progress(1000, stream=stream, interval=1.0, clock=clock)
+
+    clock.now = 0.5
+    progress.update(100, translator_at(10, 2))
+    assert stream.getvalue() == ''
+
+    clock.now = 1.0
+    progress.update(250, translator_at(25, 5))
+    clock.now = 1.5
+    progress.update(300, translator_at(30, 6))
+    assert stream.getvalue() == (
+        '250.0 B / 1000.0 B (25.0%), line 25, 5 transactions (5/s), '
+        'ETA 3s\n')
+
+
+def test_json_reports():
+    clock = FakeClock()
+    stream = io.StringIO()
+    progress = Progress(1000, stream=stream, json_lines=True, clock=clock)
+
+    clock.now = 2.0
+    progress.update(500, translator_at(50, 10))
+    clock.now = 4.0
+    progress.finish(1000, translator_at(100, 20))
+
+    reports = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert reports == [
+        {'bytes': 500, 'total_bytes': 1000, 'lines': 50, 'transactions': 10,
+         'transactions_per_sec': 5.0, 'elapsed': 2.0, 'eta': 2.0,
+         'done': False},
+        {'bytes': 1000, 'total_bytes': 1000, 'lines': 100,
+         'transactions': 20, 'transactions_per_sec': 5.0, 'elapsed': 4.0,
+         'eta': 0.0, 'done': True},
+    ]
+
+
+def test_eta_ignores_work_done_before_resuming():
+    clock = FakeClock()
+    stream = io.StringIO()
+    progress = Progress(1000, stream=stream, json_lines=True, clock=clock)
+    progress.start(600)
+
+    clock.now = 1.0
+    progress.update(700, translator_at(70, 0))
+    assert json.loads(stream.getvalue())['eta'] == 3.0
+
+
+def test_rate_ignores_transactions_before_resuming():
+    clock = FakeClock()
+    stream = io.StringIO()
+    progress = Progress(1000, stream=stream, json_lines=True, clock=clock)
+    progress.start(600, transactions=60)
+
+    clock.now = 2.0
+    progress.update(700, translator_at(70, 70))
+    assert json.loads(stream.getvalue())['transactions_per_sec'] == 5.0
@@ -0,0 +1,52 @@
+import pytest
+
+from ledger_to_beancount.rules import (
+    AccountTrie, InvalidRuleError, load_rules
+)
+
+
+def test_longest_prefix_wins():
+    trie = AccountTrie([
+        ('Food', 'Expenses:Food'),
+        ('Food:Eating Out', 'Expenses:Restaurants'),
+    ])
+    assert trie.rewrite('Food') == 'Expenses:Food'
+    assert trie.rewrite('Food:Groceries') == 'Expenses:Food:Groceries'
+    assert trie.rewrite('Food:Eating Out') == 'Expenses:Restaurants'
+    assert trie.rewrite('Food:Eating Out:Thai') == 'Expenses:Restaurants:Thai'
+
+
+def test_prefixes_only_match_whole_components():
+    trie = AccountTrie([('Food', 'Expenses:Food')])
+    assert trie.rewrite('Foodstuffs') == 'Foodstuffs'
+    assert trie.rewrite('Assets:Food') == 'Assets:Food'
+    assert trie.match('Assets:Food') is None
+    assert trie.match('Food') == 'Expenses:Food'
+
+
+def test_later_rules_replace_earlier_ones():
+    trie = AccountTrie([('Food', 'Expenses:Food')])
+    trie.add('Food', 'Expenses:Groceries')
+    assert trie.rewrite('Food:Milk') == 'Expenses:Groceries:Milk'
+
+
+def test_load_rules(tmpdir):
+    path = tmpdir.join('rules')
+    path.write('; Comment\n'
+               '# Another comment\n'
+               '\n'
+               'Food = Expenses:Food\n'
+               'Liabilities:Visa=Liabilities:CreditCard\n')
+    assert load_rules(str(path)) == [
+        ('Food', 'Expenses:Food'),
+        ('Liabilities:Visa', 'Liabilities:CreditCard'),
+    ]
+
+
+def test_load_rules_complains_about_nonsense(tmpdir):
+    path = tmpdir.join('rules')
+    path.write('Food = Expenses:Food\n'
+               'Drink\n')
+    with pytest.raises(InvalidRuleError) as excinfo:
+        load_rules(str(path))
+    assert excinfo.value.lineno == 2
@@ -0,0 +1,144 @@
+from http.client import HTTPConnection
+import json
+import threading
+
+import pytest
+
+from ledger_to_beancount import translate_file
+from ledger_to_beancount import server
+
+from .test_functional import from_triple_quoted_string
+
+
+LEDGER = """\
+2017-01-02 An ordinary transaction
+    Expenses:Restaurants    $40
+    Assets:Cash
+"""
+
+
+def run_server(**kwargs):
+    pool = server.start_pool(1)
+    httpd = server.make_server(pool, **kwargs)
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    thread.join()
+    httpd.server_close()
+    pool.shutdown()
+
+
+@pytest.fixture(scope='module')
+def socket_path(tmpdir_factory):
+    path = str(tmpdir_factory.mktemp('server').join('socket'))
+    for _ in run_server(socket_path=path):
+        yield path
+
+@pytest.fixture(scope='module')
+def port():
+    for httpd in run_server(port=0):
+        yield httpd.server_port
+
+
+def post(socket_path, body, content_type='text/plain', port=None,
+         host=None):
+    if port is None:
+        connection = server.UnixHTTPConnection(socket_path, timeout=10)
+    else:
+        connection = HTTPConnection('127.0.0.1', port, timeout=10)
+    headers = {'Content-Type': content_type}
+    if host is not None:
+        headers['Host'] = host
+    connection.request('POST', '/convert', body=body.encode('utf-8'),
+                       headers=headers)
+    response = connection.getresponse()
+    content = response.read().decode('utf-8')
+    connection.close()
+    return response.status, content
+
+
+def expected_output():
+    return '\n'.join(translate_file(LEDGER.splitlines(True))) + '\n'
+
+
+def test_convert_text(socket_path):
+    assert post(socket_path, LEDGER) == (200, expected_output())
+
+
+def test_convert_json_text(socket_path):
+    body = json.dumps({'text': LEDGER})
+    assert post(socket_path, body, 'application/json') == \
+        (200, expected_output())
+
+
+def test_convert_path(socket_path, tmpdir):
+    ledger_file = tmpdir.join('input.ledger')
+    ledger_file.write(LEDGER)
+    body = json.dumps({'path': str(ledger_file)})
+    assert post(socket_path, body, 'application/json') == \
+        (200, expected_output())
+
+
+def test_balance_assertion_error(socket_path):
+    status, content = post(socket_path, '\n'.join(from_triple_quoted_string("""
+    2017-01-02 Blah blah
+        Assets:Cash   = $40
+        Expenses:Cash
+    """)))
+    assert status == 422
+    assert json.loads(content) == {
+        'error': 'BalanceAssertionTooComplicated', 'lineno': 3}
+
+
+def test_invalid_commodity_error(socket_path):
+    status, content = post(socket_path, '\n'.join(from_triple_quoted_string("""
+    2/6/2010 An ordinary transaction
+        Expenses:Restaurants    40 "PDX4U"
+        Assets:Cash
+    """)))
+    assert status == 422
+    assert json.loads(content) == {
+        'error': 'InvalidCommodityError', 'unit': 'PDX4U'}
+
+
+def test_missing_file(socket_path, tmpdir):
+    body = json.dumps({'path': str(tmpdir.join('nope.ledger'))})
+    status, content = post(socket_path, body, 'application/json')
+    assert status == 422
+    assert json.loads(content)['error'] == 'FileNotFoundError'
+
+
+def test_bad_request(socket_path):
+    status, content = post(socket_path, '[1, 2]', 'application/json')
+    assert status == 400
+    assert json.loads(content)['error'] == 'BadRequest'
+
+
+def test_health(socket_path):
+    connection = server.UnixHTTPConnection(socket_path, timeout=10)
+    connection.request('GET', '/health')
+    response = connection.getresponse()
+    assert (response.status, response.read()) == (200, b'ok\n')
+
+
+def test_port_converts_text(port):
+    assert post(None, LEDGER, port=port) == (200, expected_output())
+    assert post(None, LEDGER, port=port, host='localhost') == \
+        (200, expected_output())
+
+
+def test_port_refuses_other_hosts(port):
+    status, content = post(None, LEDGER, port=port,
+                           host='evil.example:{}'.format(port))
+    assert status == 403
+    assert json.loads(content)['error'] == 'Forbidden'
+
+
+def test_port_refuses_paths(port, tmpdir):
+    ledger_file = tmpdir.join('input.ledger')
+    ledger_file.write(LEDGER)
+    body = json.dumps({'path': str(ledger_file)})
+    status, content = post(None, body, 'application/json', port=port)
+    assert status == 403
+    assert json.loads(content)['error'] == 'Forbidden'
@@ -0,0 +1,97 @@
+import os
+
+from ledger_to_beancount import shard
+
+from .test_functional import from_triple_quoted_string
+
+
+LEDGER = from_triple_quoted_string("""
+; Preamble comment
+
+2016-12-31 Last year
+    Expenses:Restaurants    $40
+    Assets:Cash
+
+2017-01-02 This year
+    Liabilities:Credit Card    $-40
+    Assets:Cash
+
+2017-01-04 Blah blah
+    Assets:Cash   = $40
+""")
+
+
+def read_lines(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read().split('\n')
+
+
+def test_shard_by_year(tmpdir):
+    output_dir = str(tmpdir)
+    shard.translate_file_to_shards(LEDGER, output_dir, shard_by='year')
+
+    assert read_lines(os.path.join(output_dir, 'main.beancount')) == \
+        from_triple_quoted_string("""
+        * Accounts
+        2010-01-01 open Assets:Cash
+        2010-01-01 open Expenses:Restaurants
+        2010-01-01 open Liabilities:CreditCard
+        * Transactions
+        ; Preamble comment
+
+        include "2016.beancount"
+        include "2017.beancount"
+        """)
+    assert read_lines(os.path.join(output_dir, '2016.beancount')) == \
+        from_triple_quoted_string("""
+        2016-12-31 * "Last year"
+          Expenses:Restaurants        40 USD
+          Assets:Cash
+
+        """)
+    assert read_lines(os.path.join(output_dir, '2017.beancount')) == \
+        from_triple_quoted_string("""
+        2017-01-02 * "This year"
+          Liabilities:CreditCard        -40 USD
+          Assets:Cash
+
+        2017-01-04 balance Assets:Cash   40 USD
+
+        """)
+
+
+def test_shard_by_account(tmpdir):
+    output_dir = str(tmpdir)
+    shard.translate_file_to_shards(LEDGER, output_dir, shard_by='account')
+    assert sorted(os.listdir(output_dir)) == [
+        'Assets.beancount', 'Expenses.beancount', 'Liabilities.beancount',
+        'main.beancount']
+    assert read_lines(os.path.join(output_dir, 'Assets.beancount')) == \
+        from_triple_quoted_string("""
+        2017-01-04 balance Assets:Cash   40 USD
+
+        """)
+
+
+def test_rerun_only_rewrites_changed_shards(tmpdir):
+    output_dir = str(tmpdir)
+    written = shard.translate_file_to_shards(LEDGER, output_dir)
+    assert len(written) == 3
+
+    assert shard.translate_file_to_shards(LEDGER, output_dir) == []
+
+    changed = LEDGER + from_triple_quoted_string("""
+    2017-02-01 Another
+        Expenses:Restaurants    $10
+        Assets:Cash
+    """)
+    assert shard.translate_file_to_shards(changed, output_dir) == [
+        os.path.join(output_dir, '2017.beancount')]
+
+
+def test_rerun_removes_stale_shards(tmpdir):
+    output_dir = str(tmpdir)
+    shard.translate_file_to_shards(LEDGER, output_dir)
+    shard.translate_file_to_shards(LEDGER[:6], output_dir)
+    assert sorted(os.listdir(output_dir)) == [
+        '2016.beancount', 'main.beancount']
@@ -0,0 +1,76 @@
+from ledger_to_beancount.sourcemap import SourceMapTranslator, SourceMap
+
+from .test_functional import from_triple_quoted_string
+
+
+LEDGER = from_triple_quoted_string("""
+; Intro comment
+alias Food=Expenses:Food
+
+2017-01-02 Groceries
+    Food    $40
+    Assets:Cash
+
+2017-01-04 Blah blah
+    ; Why this is the balance
+    Assets:Cash   = $40
+
+2017-01-05 Dinner
+    Food    $10
+    Assets:Cash
+""")
+
+
+def translate_with_source_map(tmpdir, lines):
+    translator = SourceMapTranslator()
+    for line in lines:
+        translator.translate_line(line)
+    output = translator.finish()
+    path = str(tmpdir.join('map'))
+    with open(path, 'wb') as f:
+        translator.write_source_map(f)
+    return output, SourceMap(path)
+
+
+def test_output_lines_map_to_ledger_lines(tmpdir):
+    output, source_map = translate_with_source_map(tmpdir, LEDGER)
+    assert output[0:4] == [
+        '* Accounts',
+        '2010-01-01 open Assets:Cash',
+        '2010-01-01 open Expenses:Food',
+        '* Transactions',
+    ]
+    assert [source_map.lookup(n) for n in range(1, len(output) + 1)] == [
+        None, None, None, None,
+        1,            # ; Intro comment
+        3,            # blank line
+        4, 5, 6, 7,   # Groceries
+        10, 9,        # Blah blah; the assertion takes the header's place
+        11, 12, 13, 14, 15,  # Dinner, and the final empty line
+    ]
+
+
+def test_lookup_past_the_end(tmpdir):
+    output, source_map = translate_with_source_map(tmpdir, LEDGER)
+    assert source_map.lookup(len(output)) == 15
+    assert source_map.lookup(len(output) + 1) is None
+
+
+def test_empty_input(tmpdir):
+    output, source_map = translate_with_source_map(tmpdir, [])
+    assert output == ['* Accounts', '* Transactions']
+    assert source_map.lookup(1) is None
+    assert source_map.lookup(3) is None
+
+
+def test_balance_assertion_maps_to_its_posting(tmpdir):
+    lines = from_triple_quoted_string("""
+2017-01-04 Blah blah
+    Assets:Cash   = $40
+; After
+""")
+    output, source_map = translate_with_source_map(tmpdir, lines)
+    assert output[3:] == [
+        '2017-01-04 balance Assets:Cash   40 USD', '; After', '']
+    assert [source_map.lookup(n) for n in range(4, len(output) + 1)] == [
+        2, 3, 4]